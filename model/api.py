@@ -1,43 +1,116 @@
 #!/usr/bin/env python
-from flask import Flask, request, jsonify
-from measurement_model import MeasurementModel
+from flask import Flask, Response, request, jsonify
+from werkzeug.exceptions import HTTPException
+import torch
+from measurement_model import InvalidImageError, MeasurementModel
+from inference_service import BatchedInferenceService
+import json
 import os
 import sys
+import threading
+import uuid
 
 # Add the current directory to the path so we can import the measurement model
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 app = Flask(__name__)
 
-# Initialize the model
-model = MeasurementModel()
+# The model is created lazily on first use rather than at import time, so
+# gunicorn workers each build their own copy (and CUDA context) after forking.
+# Requests share it through a queue that batches concurrent detector calls.
+service = None
+service_lock = threading.Lock()
+
+def get_service():
+    """Return the shared inference service, creating the model on first use"""
+    global service
+    if service is None:
+        with service_lock:
+            if service is None:
+                service = BatchedInferenceService(MeasurementModel())
+    return service
+
+def multipart_response(result):
+    """
+    Build a multipart/mixed response with the measurements as a JSON part
+    followed by the annotated image as a raw image/jpeg part
+    """
+    image = result.pop('annotatedImage', None)
+    boundary = uuid.uuid4().hex
+    
+    body = bytearray()
+    body += f'--{boundary}\r\nContent-Type: application/json\r\n\r\n'.encode('ascii')
+    body += json.dumps(result).encode('utf-8')
+    if image is not None:
+        body += f'\r\n--{boundary}\r\nContent-Type: image/jpeg\r\n\r\n'.encode('ascii')
+        body += image
+    body += f'\r\n--{boundary}--\r\n'.encode('ascii')
+    
+    return Response(bytes(body), mimetype=f'multipart/mixed; boundary={boundary}')
 
 @app.route('/measure', methods=['POST'])
 def measure():
     """
     Endpoint to process an image and return measurement results
     Expects JSON with a base64 encoded image
+    
+    By default the annotated image is returned as a base64 data URL inside
+    the JSON. With ?format=multipart the response is multipart/mixed instead,
+    carrying the raw JPEG without the base64 overhead.
     """
     if not request.json or 'image' not in request.json:
         return jsonify({'success': False, 'message': 'No image data provided'}), 400
     
     image_data = request.json['image']
     
+    if request.args.get('format') == 'multipart':
+        result = get_service().process_image(image_data, image_format='jpeg')
+        return multipart_response(result)
+    
     # Process the image
-    result = model.process_image(image_data)
+    result = get_service().process_image(image_data)
     
     return jsonify(result)
 
+def error_response(error, status):
+    """Report a failed measurement in the same shape as a normal result"""
+    print(f"Error processing image: {error}")
+    return jsonify({
+        'success': False,
+        'message': f'Error processing image: {str(error)}',
+        'measurements': []
+    }), status
+
+@app.errorhandler(InvalidImageError)
+def handle_invalid_image(error):
+    """The image data could not be decoded"""
+    return error_response(error, 400)
+
+@app.errorhandler(torch.cuda.OutOfMemoryError)
+def handle_out_of_memory(error):
+    """Release cached GPU memory so the next request has a chance to succeed"""
+    torch.cuda.empty_cache()
+    return error_response(error, 503)
+
+@app.errorhandler(Exception)
+def handle_error(error):
+    """Any other failure while processing an image"""
+    if isinstance(error, HTTPException):
+        return error
+    return error_response(error, 500)
+
 @app.route('/health', methods=['GET'])
 def health():
     """Health check endpoint"""
-    return jsonify({'status': 'ok', 'model_loaded': model.model is not None})
+    model = get_service().model
+    return jsonify({'status': 'ok', 'model_loaded': model.model is not None, 'model_ready': model.ready.is_set()})
 
 if __name__ == '__main__':
     # Get port from environment variable or use default
     port = int(os.environ.get('PYTHON_API_PORT', 5001))
     
-    # Run the Flask app
+    # Run the Flask development server
+    # For production use gunicorn instead (see gunicorn.conf.py)
     # For Windows compatibility, use 127.0.0.1 instead of 0.0.0.0
     host = '127.0.0.1' if sys.platform.startswith('win') else '0.0.0.0'
     app.run(host=host, port=port)
\ No newline at end of file
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""
+Export the YOLOv5 detector to an optimized inference engine
+
+Run this once on the machine that serves the model. The exported file is
+written next to yolov5s.pt in the project root, where MeasurementModel picks
+it up automatically on startup.
+
+Usage:
+    python model/export_model.py                    # TensorRT (CUDA)
+    python model/export_model.py --format openvino  # OpenVINO (CPU)
+    python model/export_model.py --format openvino --int8  # INT8 OpenVINO (CPU)
+    python model/export_model.py --format onnx      # ONNX Runtime (CPU or CUDA)
+    python model/export_model.py --format onnx --int8  # INT8 ONNX Runtime (CPU)
+    python model/export_model.py --format torchscript  # TorchScript (CPU or CUDA)
+"""
+import argparse
+import os
+import sys
+
+import torch
+
+from measurement_model import IMG_SIZE, MAX_BATCH_SIZE, WEIGHTS_DIR
+
+# Output written by the YOLOv5 exporter for each format
+EXPORT_OUTPUTS = {
+    'engine': 'yolov5s.engine',
+    'openvino': 'yolov5s_openvino_model',
+    'onnx': 'yolov5s.onnx',
+    'torchscript': 'yolov5s.torchscript',
+}
+
+# Formats that support --int8
+INT8_FORMATS = ('onnx', 'openvino')
+
+
+def get_yolov5_repo():
+    """
+    Make sure the ultralytics/yolov5 hub repo is cached and importable
+
+    Returns:
+        Path to the cached repo
+    """
+    torch.hub.load('ultralytics/yolov5', 'yolov5s', pretrained=True)
+    repo_dir = os.path.join(torch.hub.get_dir(), 'ultralytics_yolov5_master')
+    if repo_dir not in sys.path:
+        sys.path.insert(0, repo_dir)
+    return repo_dir
+
+
+def export_detector(export_format='engine', int8=False):
+    """
+    Export the detector with the YOLOv5 exporter
+
+    TensorRT engines are built in FP16 on the GPU. The YOLOv5 exporter
+    cannot combine FP16 with a dynamic batch, so engines have a fixed batch
+    of MAX_BATCH_SIZE images and MeasurementModel pads smaller batches up
+    to it. All other formats have a dynamic batch dimension (up to
+    MAX_BATCH_SIZE) so the inference service can run batched requests
+    through them. INT8 OpenVINO models are quantized by the exporter with
+    NNCF, calibrated on the coco128 images it downloads. TorchScript models
+    are traced on the GPU when there is one, since the trace is tied to the
+    device it was recorded on.
+
+    Args:
+        export_format: 'engine', 'openvino', 'onnx' or 'torchscript'
+        int8: Quantize an OpenVINO model to INT8 (see quantize_onnx for ONNX)
+
+    Returns:
+        Path to the exported model
+    """
+    if export_format == 'engine' and not torch.cuda.is_available():
+        raise RuntimeError("TensorRT export requires a CUDA device")
+
+    get_yolov5_repo()
+    import export
+
+    weights = os.path.join(WEIGHTS_DIR, 'yolov5s.pt')
+    use_gpu = export_format == 'engine' or (export_format == 'torchscript' and torch.cuda.is_available())
+    half = export_format == 'engine'
+    export.run(weights=weights, imgsz=(IMG_SIZE, IMG_SIZE), include=(export_format,),
+               half=half, int8=int8, dynamic=not half, batch_size=MAX_BATCH_SIZE,
+               device='0' if use_gpu else 'cpu')
+    if int8:
+        return os.path.join(WEIGHTS_DIR, 'yolov5s_int8_openvino_model')
+    return os.path.join(WEIGHTS_DIR, EXPORT_OUTPUTS[export_format])
+
+
+def quantize_onnx(onnx_path):
+    """
+    Quantize an exported ONNX detector to INT8 for CPU inference
+
+    Uses ONNX Runtime dynamic quantization: weights are stored as INT8 and
+    activations are quantized on the fly, so no calibration set is needed.
+
+    Args:
+        onnx_path: Path to the FP32 ONNX model
+
+    Returns:
+        Path to the quantized model
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = os.path.join(WEIGHTS_DIR, 'yolov5s-int8.onnx')
+    quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+    return quantized_path
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export the YOLOv5 detector to an optimized inference engine')
+    parser.add_argument('--format', choices=sorted(EXPORT_OUTPUTS), default='engine',
+                        help='inference backend to export for')
+    parser.add_argument('--int8', action='store_true',
+                        help='quantize to INT8 for CPU inference (onnx and openvino only)')
+    args = parser.parse_args()
+    if args.int8 and args.format not in INT8_FORMATS:
+        parser.error(f"--int8 is only supported with --format {' or '.join(INT8_FORMATS)}")
+
+    output_path = export_detector(args.format, int8=args.int8 and args.format == 'openvino')
+    if args.int8 and args.format == 'onnx':
+        output_path = quantize_onnx(output_path)
+    print(f"Exported detector to {output_path}")
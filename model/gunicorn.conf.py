@@ -0,0 +1,41 @@
+"""
+Gunicorn settings for the model server
+
+Run from the model directory:
+    gunicorn -c gunicorn.conf.py api:app
+
+Each worker loads its own MeasurementModel after forking, so every worker
+gets its own CUDA context. Do not enable preload_app on GPU machines: a CUDA
+context cannot be shared across fork.
+"""
+import os
+import sys
+
+# Gunicorn runs this file from its own script, make the model modules importable
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from measurement_model import MAX_BATCH_SIZE
+
+bind = f"0.0.0.0:{os.environ.get('PYTHON_API_PORT', 5001)}"
+
+# One worker per GPU: every worker holds its own copy of the model and its
+# own CUDA context, and concurrent requests only share a forward pass when
+# they reach the same worker's batcher (see BatchedInferenceService). Workers
+# all use the first visible GPU, on multi-GPU machines run one server per GPU
+# with CUDA_VISIBLE_DEVICES
+workers = int(os.environ.get('MODEL_WORKERS', 1))
+worker_class = 'gthread'
+
+# Each thread has at most one request in flight, so a worker needs at least
+# MAX_BATCH_SIZE threads to fill a batch. Twice that keeps a full batch
+# queued while other requests are still being decoded or encoded.
+threads = int(os.environ.get('MODEL_THREADS', 2 * MAX_BATCH_SIZE))
+
+# Loading YOLOv5 can take a while on a cold start
+timeout = 120
+
+
+def post_fork(server, worker):
+    # Load the model up front instead of on the first request
+    from api import get_service
+    get_service()
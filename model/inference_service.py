@@ -0,0 +1,97 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from measurement_model import MAX_BATCH_SIZE
+
+
+class BatchedInferenceService:
+    """
+    Runs the detector on images from concurrent requests in batches
+
+    Request threads still decode, measure and encode their own image; only
+    the detector call goes through the queue. A single worker thread drains
+    the queue, waiting up to max_wait seconds to fill a batch, so concurrent
+    requests share one forward pass instead of queueing behind each other.
+    """
+
+    def __init__(self, model, max_batch_size=MAX_BATCH_SIZE, max_wait=0.005):
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._queue = queue.Queue()
+
+        worker = threading.Thread(target=self._run, name='inference-batcher', daemon=True)
+        worker.start()
+
+    def detect_objects(self, image):
+        """
+        Detect objects in the image as part of the next batch
+
+        Args:
+            image: Preprocessed image
+
+        Returns:
+            Detected objects with their bounding boxes and classes
+        """
+        future = Future()
+        self._queue.put((image, future))
+        return future.result()
+
+    def process_image(self, image_data, image_format='base64', color_order='bgr'):
+        """
+        Process an image and return the measurement results
+
+        Args:
+            image_data: Image data (base64, file path, or numpy array)
+            image_format: How to return the annotated image, see MeasurementModel.build_result
+            color_order: Channel order of numpy array input, see MeasurementModel.preprocess_image
+
+        Returns:
+            Measurement results, see MeasurementModel.process_image
+        """
+        image = self.model.preprocess_image(image_data, color_order)
+        detections = self.detect_objects(image)
+        return self.model.build_result(image, detections, image_format,
+                                       in_place=not isinstance(image_data, np.ndarray))
+
+    def _next_batch(self):
+        """Block for the next request, then collect more until the batch is full or max_wait passes"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=timeout))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            images = [image for image, _ in batch]
+            try:
+                batch_detections = self.model.detect_objects_batch(images)
+            except Exception as e:
+                if len(batch) == 1:
+                    batch[0][1].set_exception(e)
+                else:
+                    self._run_one_by_one(batch)
+                continue
+
+            for (_, future), detections in zip(batch, batch_detections):
+                future.set_result(detections)
+
+    def _run_one_by_one(self, batch):
+        """Run a failed batch again image by image, so only the requests whose image fails get the error"""
+        for image, future in batch:
+            try:
+                future.set_result(self.model.detect_objects_batch([image])[0])
+            except Exception as e:
+                future.set_exception(e)
@@ -0,0 +1,38 @@
+"""
+Tests for the model server API
+
+Run from the repository root:
+    python -m unittest discover model/tests
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api
+from measurement_model import InvalidImageError
+
+
+class MeasureErrorTest(unittest.TestCase):
+    def post_failing(self, error):
+        """POST /measure with a service that raises error"""
+        service = mock.Mock()
+        service.process_image.side_effect = error
+        with mock.patch.object(api, 'get_service', return_value=service):
+            return api.app.test_client().post('/measure', json={'image': 'data:image/jpeg;base64,'})
+
+    def test_invalid_image_is_a_bad_request(self):
+        response = self.post_failing(InvalidImageError("Could not decode image data"))
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json['success'])
+
+    def test_internal_value_error_is_a_server_error(self):
+        response = self.post_failing(ValueError("Could not encode annotated image"))
+        self.assertEqual(response.status_code, 500)
+        self.assertFalse(response.json['success'])
+
+
+if __name__ == '__main__':
+    unittest.main()
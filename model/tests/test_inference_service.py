@@ -0,0 +1,58 @@
+"""
+Tests for BatchedInferenceService
+
+Run from the repository root:
+    python -m unittest discover model/tests
+"""
+import os
+import sys
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_service import BatchedInferenceService
+
+
+class FakeModel:
+    """Detects one object per image, and fails any batch with a 'corrupt' image"""
+
+    def __init__(self):
+        self.batch_sizes = []
+        self.lock = threading.Lock()
+
+    def detect_objects_batch(self, images):
+        with self.lock:
+            self.batch_sizes.append(len(images))
+        if 'corrupt' in images:
+            raise ValueError("Could not letterbox image")
+        return [[{'class': image}] for image in images]
+
+
+class BatchedInferenceServiceTest(unittest.TestCase):
+    def test_failing_image_only_fails_its_own_request(self):
+        model = FakeModel()
+        # A long wait so all requests end up in the same batch
+        service = BatchedInferenceService(model, max_batch_size=4, max_wait=1.0)
+        images = ['a', 'corrupt', 'b', 'c']
+        with ThreadPoolExecutor(max_workers=len(images)) as executor:
+            futures = [executor.submit(service.detect_objects, image) for image in images]
+
+        self.assertEqual(model.batch_sizes[0], 4)
+        self.assertEqual(futures[0].result(), [{'class': 'a'}])
+        with self.assertRaises(ValueError):
+            futures[1].result()
+        self.assertEqual(futures[2].result(), [{'class': 'b'}])
+        self.assertEqual(futures[3].result(), [{'class': 'c'}])
+
+    def test_failing_single_image_is_not_retried(self):
+        model = FakeModel()
+        service = BatchedInferenceService(model, max_wait=0)
+        with self.assertRaises(ValueError):
+            service.detect_objects('corrupt')
+        self.assertEqual(model.batch_sizes, [1])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+"""
+Tests for MeasurementModel
+
+Run from the repository root:
+    python -m unittest discover model/tests
+"""
+import os
+import sys
+import unittest
+from unittest import mock
+
+import numpy as np
+import torch
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import measurement_model
+from measurement_model import MeasurementModel
+
+
+@unittest.skipUnless(torch.cuda.is_available(), "needs a CUDA GPU")
+class CudaGraphTest(unittest.TestCase):
+    @torch.inference_mode()
+    def test_replays_match_eager_across_shapes(self):
+        # Runs before the other tests, so the shared detector stays uncompiled
+        model = MeasurementModel(compile_model=False)
+        model.ready.wait()
+        if model._cuda_graphs is None:
+            self.skipTest("the detector is not run through manual CUDA graphs")
+        
+        # Alternating letterbox rectangles makes Detect rebuild its grids
+        # between replays of each captured graph
+        rng = np.random.default_rng(0)
+        for height, width in [(480, 640), (640, 480), (480, 640), (640, 640), (640, 480), (480, 640)]:
+            image = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+            x, _ = model.upload_batch([image])
+            replayed = model.forward(x)
+            eager = model.model.model(x)[0]
+            torch.testing.assert_close(replayed, eager, rtol=1e-2, atol=0.5)
+
+
+class LoadYolov5Test(unittest.TestCase):
+    def hub_device(self, device):
+        """Return the device load_yolov5 passes to torch.hub.load"""
+        with mock.patch.object(torch.hub, 'load') as hub_load:
+            measurement_model.load_yolov5.__wrapped__('yolov5s.pt', device)
+        return hub_load.call_args.kwargs['device']
+
+    def test_device_is_passed_as_a_select_device_string(self):
+        # select_device asserts on str(torch.device('cuda')) == 'cuda'
+        self.assertEqual(self.hub_device(torch.device('cuda')), '0')
+        self.assertEqual(self.hub_device(torch.device('cuda', 1)), '1')
+        self.assertEqual(self.hub_device(torch.device('cpu')), 'cpu')
+
+
+class MeasurementModelLoadTest(unittest.TestCase):
+    def test_detector_loads(self):
+        model = MeasurementModel()
+        model.ready.wait()
+        # Without a detector the model silently returns simulated detections
+        self.assertIsNotNone(model.model)
+        detections = model.detect_objects(np.zeros((480, 640, 3), dtype=np.uint8))
+        self.assertTrue(all(d['classId'] != -1 for d in detections))
+        if getattr(model.model.model, 'pt', False):
+            self.assertEqual(next(model.model.model.parameters()).device.type, model.device.type)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -62,6 +62,11 @@ export class ModelClient {
       });
       
       if (!response.ok) {
+        // The model server reports processing errors as a JSON result with a message
+        const error = await response.json().catch(() => null) as MeasurementResult | null;
+        if (error && error.message) {
+          return { success: false, message: error.message, measurements: [] };
+        }
         throw new Error(`HTTP error! status: ${response.status}`);
       }
       